@@ -1,44 +1,66 @@
 import os
 import json
+import logging
+import multiprocessing as mp
 from extract_timetable import extract_timetable
 
 # Folder containing all timetable PDFs to be processed
 PDF_FOLDER = "pdfs"
 
-# This list will accumulate all parsed timetable entries
-all_results = []
-
-# Iterate through every PDF in the target folder
-for filename in os.listdir(PDF_FOLDER):
-    if filename.lower().endswith(".pdf"):
-        pdf_path = os.path.join(PDF_FOLDER, filename)
-        print(f"\n=== Processing: {filename} ===")
-
-        try:
-            # Extract structured timetable information from the current PDF
-            entries = extract_timetable(pdf_path)
-            print(f"✓ Extracted {len(entries)} entries")
-
-            # Attach source metadata for better traceability during aggregation
-            for e in entries:
-                e["sourcePDF"] = filename
-
-            # Accumulate all extracted records into the global list
-            all_results.extend(entries)
-
-        except Exception as e:
-            # Gracefully handle failures in individual PDF processing
-            print(f"❌ Error processing {filename}: {e}")
-
-# ---- PREVIEW SECTION (FIRST 5 RECORDS) ----
-# Helpful preview to verify extraction quality without loading entire dataset
-print("\nPreview (first 5 total entries):")
-if len(all_results) == 0:
-    print("No entries found.")
-else:
-    print(json.dumps(all_results[:5], indent=2, ensure_ascii=False))
-
-# ---- FINAL SUMMARY ----
-# Overall extraction stats for multi-PDF processing
-print(f"\n🎉 DONE! Total entries collected: {len(all_results)}")
-print("Note: Processing completed successfully.")
+# Show extractor warnings as plain lines (also run in each pool worker)
+def init_logging():
+    logging.basicConfig(format="%(message)s")
+
+# Number of entries shown in the final preview
+PREVIEW_SIZE = 5
+
+# Worker: parse one PDF and report (filename, count, preview, error) back to
+# the parent. Full results stay in the worker (and in the per-PDF cache), so
+# only a handful of entries are ever pickled across processes.
+def process_one_pdf(filename):
+    pdf_path = os.path.join(PDF_FOLDER, filename)
+    try:
+        # Extract structured timetable information from the current PDF
+        entries = extract_timetable(pdf_path)
+
+        # Attach source metadata for better traceability during aggregation
+        preview = entries[:PREVIEW_SIZE]
+        for e in preview:
+            e["sourcePDF"] = filename
+        return filename, len(entries), preview, None
+
+    except Exception as e:
+        # Gracefully handle failures in individual PDF processing
+        return filename, 0, [], str(e)
+
+if __name__ == "__main__":
+    # Only the preview and a running count are kept, not every entry
+    preview = []
+    total = 0
+
+    # Every PDF is independent, so fan them out across CPU cores
+    pdf_files = [f for f in sorted(os.listdir(PDF_FOLDER)) if f.lower().endswith(".pdf")]
+    init_logging()
+    with mp.Pool(min(len(pdf_files), os.cpu_count() or 1) or 1, initializer=init_logging) as pool:
+        for filename, count, entries, err in pool.imap(process_one_pdf, pdf_files):
+            print(f"\n=== Processing: {filename} ===")
+            if err is not None:
+                print(f"❌ Error processing {filename}: {err}")
+                continue
+            print(f"✓ Extracted {count} entries")
+
+            preview.extend(entries[:PREVIEW_SIZE - len(preview)])
+            total += count
+
+    # ---- PREVIEW SECTION (FIRST 5 RECORDS) ----
+    # Helpful preview to verify extraction quality without loading entire dataset
+    print("\nPreview (first 5 total entries):")
+    if total == 0:
+        print("No entries found.")
+    else:
+        print(json.dumps(preview, indent=2, ensure_ascii=False))
+
+    # ---- FINAL SUMMARY ----
+    # Overall extraction stats for multi-PDF processing
+    print(f"\n🎉 DONE! Total entries collected: {total}")
+    print("Note: Processing completed successfully.")
@@ -1,66 +1,147 @@
-import pdfplumber, re, json, os, sys
+import re, json, os, sys, hashlib, logging
+from functools import lru_cache
+from operator import attrgetter
+from collections import namedtuple
+
+# Warnings go through logging, so they cost nothing when the level is off
+log = logging.getLogger(__name__)
+
+# PDF backend: pdfplumber by default. PyMuPDF (C-backed MuPDF, faster) is
+# opt-in via TIMETABLE_PDF_BACKEND=pymupdf, since it can split merged cells
+# and order page text differently; it is only used if the installed "fitz"
+# really is PyMuPDF >= 1.23 (the first release with Page.find_tables).
+PDF_BACKEND = "pdfplumber"
+if os.environ.get("TIMETABLE_PDF_BACKEND", "").lower() == "pymupdf":
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    if hasattr(getattr(fitz, "Page", None), "find_tables"):
+        PDF_BACKEND = "pymupdf"
+    else:
+        log.warning("PyMuPDF >= 1.23 not available; using pdfplumber")
+if PDF_BACKEND == "pdfplumber":
+    import pdfplumber
+
+# Optional linear-time (DFA) engine for the cell tokenizer; falls back to re
+try:
+    import re2 as cell_re
+except ImportError:
+    cell_re = re
+
+# orjson (Rust) serializes large entry lists much faster than stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Regex to detect time formats such as 09:30 or 1:55
 TIME = re.compile(r"\d{1,2}:\d{2}")
 
+# Subject + Room pattern recognition used while decoding merged cells.
+# Separators are any whitespace except a newline, so a match never runs
+# across lines but tabs and the non-breaking spaces common in PDF text
+# still count. \xa0 is listed explicitly because RE2's \s is ASCII-only.
+HSPACE = r"(?:[^\S\n]|\xa0)"
+SUBJ_RE = re.compile(rf"\b(?:[A-Z]{{2,4}}{HSPACE}?-?{HSPACE}?\d{{2,4}}|ELECTIVE|CEC|PROJECT)\b", re.I)
+ROOM_RE = re.compile(rf"\b(?:CR|LAB|LT|TCL|UBUNTU{HSPACE}?LAB|VENUE){HSPACE}?\d{{0,3}}\b", re.I)
+
+# Single-pass cell tokenizer: rooms, subjects and line breaks in one scan.
+# The pattern is plain alternation (no backreferences or look-around), so
+# RE2 runs it as a DFA; if a given re2 binding still rejects it, use re.
+CELL_PATTERN = rf"(?i)(?P<room>{ROOM_RE.pattern})|(?P<subj>{SUBJ_RE.pattern})|(?P<nl>\n\s*)"
+try:
+    CELL_RE = cell_re.compile(CELL_PATTERN)
+except cell_re.error:
+    CELL_RE = re.compile(CELL_PATTERN)
+
+# Cheap prefilter: a subject needs a digit or one of the bare keywords, so
+# cells without either ("LUNCH", "BREAK", ...) cannot yield an entry
+SUBJ_HINT_RE = re.compile(r"\d|ELECTIVE|CEC|PROJECT", re.I)
+
+# Section label printed in the page header, e.g. "Section: CS-1"
+SECTION_RE = re.compile(r"Section\s*[:\-]?\s*([A-Za-z0-9\-]+)", re.I)
+
+# Parsed results are cached here, keyed by the sha256 of each PDF's bytes.
+# Bump CACHE_VERSION whenever the parsing logic changes its output.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+CACHE_VERSION = 3
+
 # Standard day ordering used across timetable structure
 DAYS = ["MON","TUE","WED","THU","FRI","SAT","SUN"]
 
+# Finds the day abbreviation anywhere in the first cell ("MON", "MONDAY", ...)
+DAY_RE = re.compile("|".join(DAYS))
+
+# Maps a matched day back to the shared constant, so every entry for a day
+# references one string object instead of a fresh copy per row
+DAY_NAMES = {d: sys.intern(d) for d in DAYS}
+
 # Cleans input text by stripping unnecessary whitespace
+@lru_cache(maxsize=2048)
 def clean(x):
     return "" if x is None else str(x).strip()
 
-# Normalizes time into consistent HH:MM format for uniform processing
-def convert(time_str):
-    if not time_str or ":" not in time_str:
-        return "Unknown"
-    h, m = time_str.split(":")
-    h = int(h)
-    return f"{h:02d}:{m}"
-
-# Parses merged PDF timetable cells to extract subject codes and room details
+# Normalizes time into 24-hour HH:MM. Timetables print afternoon slots
+# on a 12-hour clock ("1:55"), and no class starts before 08:00, so hours
+# below 8 are treated as PM. Expects text already matched by TIME.
+@lru_cache(maxsize=256)
+def convert_to_24hr(time_str):
+    i = time_str.find(":")
+    h = int(time_str[:i])
+    if h < 8:
+        h += 12
+    return f"{h:02d}:{time_str[i+1:i+3]}"
+
+# Canonical form of a subject/room token, e.g. "cr 104" -> "CR104".
+# split() drops every kind of whitespace a token may contain (space, tab,
+# NBSP, ...), matching the [^\S\n] separators allowed by the patterns.
+@lru_cache(maxsize=1024)
+def normalize_code(tok):
+    return sys.intern("".join(tok.upper().split()))
+
+# Parses merged PDF timetable cells to extract subject codes and room details.
+# Returns a tuple of (subjectCode, room) pairs; the same cell text recurs
+# across rows and pages, so results are memoized (and immutable).
+@lru_cache(maxsize=4096)
 def parse_cell(text):
-    if not text.strip():
-        return []
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    
-    # Subject + Room pattern recognition
-    subj_re = re.compile(r"\b([A-Z]{2,4}\s?-?\s?\d{2,4}|ELECTIVE|CEC|PROJECT)\b", re.I)
-    room_re = re.compile(r"\b(CR|LT|LAB|TCL|VENUE|UBUNTU\s?LAB)\s?\d{0,3}\b", re.I)
-
-    out = []
-    for i, ln in enumerate(lines):
-        sm = subj_re.search(ln)
-        if sm:
-            subj = sm.group(0).upper().replace(" ","")
-            room = "Unknown"
-            
-            # Attempt to capture room details positioned near subject line
-            if i+1 < len(lines):
-                rm = room_re.search(lines[i+1])
-                if rm: room = rm.group(0).upper().replace(" ","")
-            if i+2 < len(lines) and room == "Unknown":
-                rm = room_re.search(lines[i+2])
-                if rm: room = rm.group(0).upper().replace(" ","")
-            
-            out.append({"subjectCode":subj, "room":room})
-    return out
+    text = text.strip()
+    if not text or not SUBJ_HINT_RE.search(text):
+        return ()
+
+    # Record the first subject and the first room found on every line
+    line = 0
+    subjects, rooms = {}, {}
+    for m in CELL_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "nl":
+            line += 1
+        elif kind == "subj":
+            subjects.setdefault(line, normalize_code(m.group(0)))
+        else:
+            rooms.setdefault(line, normalize_code(m.group(0)))
+
+    # Attempt to capture room details positioned near subject line
+    return tuple((subj, rooms.get(i+1) or rooms.get(i+2) or "Unknown")
+                 for i, subj in subjects.items())
 
 # Extracts section information from PDF header text
 def detect_section(text):
-    m = re.search(r"Section\s*[:\-]?\s*([A-Za-z0-9\-]+)", text, re.I)
-    if m: return m.group(1).upper()
+    m = SECTION_RE.search(text)
+    if m: return sys.intern(m.group(1).upper())
     return "UNKNOWN"
 
 # Identifies actual time columns in the timetable header row
 def detect_time_columns(header_row):
     time_cols = []
     for i, cell in enumerate(header_row):
-        t = clean(cell)
-        found = TIME.findall(t)
+        # Empty header cells and cells without a ":" cannot hold a time
+        if not cell or ":" not in cell:
+            continue
+        found = TIME.search(cell)
         if found:
             # Register column index + normalized time
-            time_cols.append((i, convert(found[0])))
+            time_cols.append((i, convert_to_24hr(found.group(0))))
 
     # Build structured list of time slots with inferred end-times
     slots = []
@@ -72,102 +153,170 @@ def detect_time_columns(header_row):
         slots.append({"col":col, "start":st, "end":et})
     return slots
 
-# Main PDF timetable extraction function
+# Determine column spans to properly group merged cells. Returns a tuple of
+# (start, end, first_col, stop_col) per slot. Pages of one PDF share the
+# same header row, so the result is memoized on the (tuple) header.
+@lru_cache(maxsize=64)
+def slot_spans(header_row):
+    time_slots = detect_time_columns(header_row)
+    spans = []
+    for i,s in enumerate(time_slots):
+        start_c = s["col"]
+        end_c = time_slots[i+1]["col"]-1 if i+1<len(time_slots) else start_c+5
+        spans.append((s["start"], s["end"], start_c, end_c+1))
+    return tuple(spans)
+
+# JSON (de)serialization to/from bytes, using orjson when available
+def dumps_json(obj):
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+def loads_json(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+# Content hash of a PDF, read in chunks to keep memory flat
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+# Main PDF timetable extraction function (skips PDFs whose bytes are unchanged)
 def extract_timetable(pdf_path):
     if not os.path.exists(pdf_path):
-        print("File not found:", pdf_path)
+        log.warning("File not found: %s", pdf_path)
         return []
 
-    result = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for pnum, page in enumerate(pdf.pages,1):
+    cache_path = os.path.join(CACHE_DIR, f"{file_sha256(pdf_path)}-{PDF_BACKEND}-v{CACHE_VERSION}.json")
+    # The cache is best-effort: an unreadable, corrupt or unwritable cache
+    # only means the PDF gets parsed, never that the PDF fails
+    try:
+        with open(cache_path, "rb") as f:
+            final = loads_json(f.read())
+    except (OSError, ValueError):
+        pass
+    else:
+        # Same bytes may live under a different file name
+        for r in final:
+            r["sourcePDF"] = os.path.basename(pdf_path)
+        return final
+
+    final = parse_pdf(pdf_path)
+
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(dumps_json(final))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.warning("Could not write cache for %s: %s", pdf_path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return final
 
-            # Extract metadata such as section headers
-            text = page.extract_text() or ""
-            section = detect_section(text)
+# The timetables are ruled grids, so tables are detected from drawn lines
+# only (no text-based clustering); tolerances are pinned at pdfplumber's
+# defaults so the detected grid stays the same across versions
+TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "lines",
+                  "snap_tolerance": 3, "join_tolerance": 3, "edge_min_length": 3}
+
+# Backend adapter: yields (table, page_text) per page. table is the page's
+# first table as a list of rows, each row a list of cell strings (None for
+# empty cells), or None if the page has no table; only the first table is
+# used downstream, so the others are never extracted. page_text is a
+# zero-argument callable, so the text pass runs only for pages that need it.
+def iter_pages(pdf_path):
+    if PDF_BACKEND == "pymupdf":
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                found = page.find_tables(strategy="lines").tables
+                yield found[0].extract() if found else None, page.get_text
+    else:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                found = page.find_tables(table_settings=TABLE_SETTINGS)
+                yield found[0].extract() if found else None, page.extract_text
 
-            # Parse table data from page
-            tables = page.extract_tables()
-            if not tables:
-                continue
+                # Drop this page's cached chars/lines/edges before the next
+                # one, so memory stays flat on long PDFs
+                page.flush_cache()
 
-            table = tables[0]
-            if len(table) < 4:
-                continue
+# Parses every page of a timetable PDF into deduplicated, ordered entries
+def parse_pdf(pdf_path):
+    return dedupe_and_sort(iter_entries(pdf_path))
 
-            # First row usually contains schedule headers
-            header = table[0]
-            time_slots = detect_time_columns(header)
+# Streams raw Entry records page by page, without holding them in a list
+def iter_entries(pdf_path):
+    src = os.path.basename(pdf_path)
 
-            if not time_slots:
-                print(f"⚠ No time slots detected on page {pnum}")
+    # Local aliases for names looked up inside the row/slot loops
+    _clean, _parse, _day_search, _entry = clean, parse_cell, DAY_RE.search, Entry
+    for pnum, (table, page_text) in enumerate(iter_pages(pdf_path), 1):
+
+        # Parse table data from page
+        if not table or len(table) < 4:
+            continue
+
+        # First row usually contains schedule headers
+        spans = slot_spans(tuple(table[0]))
+
+        if not spans:
+            log.warning("⚠ No time slots detected on page %d of %s", pnum, src)
+            continue
+
+        # Extract metadata such as section headers (only for timetable pages)
+        section = detect_section(page_text() or "")
+
+        # Process each row containing actual timetable data
+        for row in table[1:]:
+            if not row or len(row)==0:
+                continue
+
+            # Extract day information
+            m = _day_search(_clean(row[0]).upper())
+            if not m:
                 continue
+            day = DAY_NAMES[m.group(0)]
 
-            # Determine column spans to properly group merged cells
-            for i,s in enumerate(time_slots):
-                start_c = s["col"]
-                end_c = time_slots[i+1]["col"]-1 if i+1<len(time_slots) else start_c+5
-                s["col_start"] = start_c
-                s["col_end"] = end_c
+            # Parse each time slot inside the row
+            for start, end, cs, ce in spans:
 
-            # Process each row containing actual timetable data
-            for row in table[1:]:
-                if not row or len(row)==0:
+                # Merge text across merged cell ranges (each piece is cleaned
+                # once and is already stripped, so the join needs no strip)
+                cell_text = "\n".join([t for c in range(cs, min(ce, len(row)))
+                                       if (t := _clean(row[c]))])
+                if not cell_text:
                     continue
 
-                # Extract day information
-                day_cell = clean(row[0]).upper()
-                day = None
-                for d in DAYS:
-                    if d in day_cell:
-                        day = d
-                        break
-                if not day:
-                    continue
+                # Decode subjects + room associations
+                for subj, room in _parse(cell_text):
+                    yield _entry(section, day, start, end, subj, room, src)
+
+# Compact record for one schedule entry (a tuple, so cheap to build, hash
+# and compare); turned into a dict only once deduplicated, for JSON output
+Entry = namedtuple("Entry", ["section","day","startTime","endTime","subjectCode","room","sourcePDF"])
 
-                # Parse each time slot inside the row
-                for slot in time_slots:
-                    cs = slot["col_start"]
-                    ce = slot["col_end"]
-
-                    # Merge text across merged cell ranges
-                    text_block = []
-                    for c in range(cs, min(ce+1, len(row))):
-                        t = clean(row[c])
-                        if t:
-                            text_block.append(t)
-
-                    cell_text = "\n".join(text_block).strip()
-                    if not cell_text:
-                        continue
-
-                    # Decode subjects + room associations
-                    parsed = parse_cell(cell_text)
-                    for p in parsed:
-                        result.append({
-                            "section": section,
-                            "day": day,
-                            "startTime": slot["start"],
-                            "endTime": slot["end"],
-                            "subjectCode": p["subjectCode"],
-                            "room": p["room"],
-                            "sourcePDF": os.path.basename(pdf_path)
-                        })
-
-    # Deduplicate entries and apply consistent ordering
-    seen = set()
-    final = []
-    day_order = {d:i for i,d in enumerate(DAYS)}
-
-    for r in result:
-        k = (r["section"],r["day"],r["startTime"],r["subjectCode"],r["room"])
-        if k not in seen:
-            seen.add(k)
-            final.append(r)
+# Deduplicate entries and apply consistent ordering
+DAY_ORDER = {d:i for i,d in enumerate(DAYS)}
+
+# Dedup key: every Entry field except endTime and sourcePDF
+DEDUP_KEY = attrgetter("section", "day", "startTime", "subjectCode", "room")
+
+def dedupe_and_sort(rows):
+    # First occurrence wins; setdefault keeps it in a single dict operation
+    seen = {}
+    _key, _keep = DEDUP_KEY, seen.setdefault
+    for r in rows:
+        _keep(_key(r), r)
 
     # Maintain chronological and section-based ordering
-    final.sort(key=lambda x:(x["section"], day_order[x["day"]], x["startTime"]))
-    return final
+    final = sorted(seen.values(), key=lambda x:(x.section, DAY_ORDER[x.day], x.startTime))
+    return [e._asdict() for e in final]
 
 
 # MAIN (PROCESSES PDF + SHOWS PREVIEW + COMPLETION STATUS)
@@ -177,6 +326,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     pdf_file = sys.argv[1]
+    logging.basicConfig(format="%(message)s")
 
     # Execute timetable extraction pipeline
     data = extract_timetable(pdf_file)